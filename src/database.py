@@ -2,30 +2,207 @@
 This module provides a DatabaseManager class for managing database operations in the application.
 
 Example usage:
-    # Create a DatabaseManager instance
-    db_manager = DatabaseManager()
+    # Create a DatabaseManager instance, which borrows a connection from the pool until the block exits
+    with DatabaseManager() as db_manager:
+        # Upsert a website into the database
+        website_id = db_manager.upsert_website("https://example.com")
 
-    # Upsert a website into the database
-    website_id = db_manager.upsert_website("https://example.com")
+        # Upsert a batch of websites and get their IDs by URL
+        website_ids = db_manager.upsert_websites(["https://example.com", "https://example.org"])
 
-    # Stream insert a batch of logs into the database
-    logs = [("https://example.com", 0.5, 200, "content", 1234567890, "log details")]
-    db_manager.stream_insert_result(logs)
+        # Stream insert a batch of logs into the database
+        logs = [("https://example.com", 0.5, 200, "content", 1234567890, "log details")]
+        db_manager.stream_insert_result(logs)
 """
 
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+import psutil
+import csv
+import io
+import itertools
+import multiprocessing
 import os
-from typing import List, Tuple, Optional
+import threading
+import struct
+from functools import partial
+from typing import Any, Dict, Iterable, List, Tuple, Optional
 from logger import log_function_call, setup_logger
-import io
 
 db_logger = setup_logger('db_operations', 'db_operations.log')
 
+# PostgreSQL binary COPY framing: see "Binary Format" in https://www.postgresql.org/docs/current/sql-copy.html
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)  # Signature, flags, header extension length
+PGCOPY_TRAILER = struct.pack('!h', -1)
+
+_FIELD_COUNT = struct.Struct('!h')
+_FIELD_LENGTH = struct.Struct('!i')
+_NULL_FIELD = _FIELD_LENGTH.pack(-1)
+_INT2_FIELD = struct.Struct('!ih')
+_INT8_FIELD = struct.Struct('!iq')
+_FLOAT8_FIELD = struct.Struct('!id')
+
+# Connection pool bounds per process
+POOL_MIN_CONN = 2
+POOL_MAX_CONN = multiprocessing.cpu_count() * 2
+
+# Adaptive COPY chunk sizing: a chunk may use CHUNK_MEMORY_SHARE of the available memory, assuming
+# ESTIMATED_ROW_BYTES per row, and is kept between MIN_CHUNK_SIZE and MAX_CHUNK_SIZE rows
+MIN_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 20000
+CHUNK_MEMORY_SHARE = 0.05
+ESTIMATED_ROW_BYTES = 512
+
+MONITOR_COPY_SQL = ("COPY t_monitor (web_id, status_code, response_time, matched_content, check_ts, detail_log) "
+                    "FROM STDIN WITH (FORMAT BINARY)")
+
+
+def _encode_text(value: str) -> bytes:
+    data = value.encode('utf-8')
+    return _FIELD_LENGTH.pack(len(data)) + data
+
+
+# Binary field encoders of the t_monitor columns, in the order of MONITOR_COPY_SQL
+_MONITOR_FIELD_ENCODERS = (
+    partial(_INT8_FIELD.pack, 8),  # web_id bigint
+    partial(_INT2_FIELD.pack, 2),  # status_code int2
+    partial(_FLOAT8_FIELD.pack, 8),  # response_time float8
+    _encode_text,  # matched_content text
+    partial(_INT8_FIELD.pack, 8),  # check_ts int8
+    _encode_text,  # detail_log text
+)
+
+
+def encode_monitor_row(row: Tuple[Any, ...]) -> bytes:
+    """
+    Encode a t_monitor row as a tuple of PostgreSQL binary COPY format.
+
+    Args:
+        row (Tuple[Any, ...]): The row values in the order of MONITOR_COPY_SQL columns. None values are encoded as NULL.
+
+    Returns:
+        bytes: The encoded tuple.
+    """
+    return _FIELD_COUNT.pack(len(row)) + b''.join(
+        _NULL_FIELD if value is None else encode(value) for encode, value in zip(_MONITOR_FIELD_ENCODERS, row))
+
+
+def adaptive_chunk_size() -> int:
+    """
+    Compute the number of rows to load with each COPY from the memory currently available on the host.
+
+    The size is scaled down linearly with the memory pressure, so the chunks shrink when the host runs low on memory.
+
+    Returns:
+        int: The chunk size, between MIN_CHUNK_SIZE and MAX_CHUNK_SIZE.
+    """
+    memory = psutil.virtual_memory()
+    pressure = 1 - memory.available / memory.total
+    chunk_size = int(memory.available * CHUNK_MEMORY_SHARE / ESTIMATED_ROW_BYTES * (1 - pressure))
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, chunk_size))
+
+
+class MonitorCopyStream(io.RawIOBase):
+    """
+    A read-only file-like object that produces t_monitor rows in PostgreSQL binary COPY format on demand.
+
+    Rows are encoded only when COPY reads from the stream, so a batch never needs to be held in memory
+    as a whole encoded buffer.
+
+    Args:
+        rows (Iterable[Tuple[Any, ...]]): The row values in the order of MONITOR_COPY_SQL columns.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[Any, ...]]):
+        super().__init__()
+        self._chunks = itertools.chain((PGCOPY_HEADER,), map(encode_monitor_row, rows), (PGCOPY_TRAILER,))
+        self._buffer = bytearray()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = len(buffer)
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        length = min(size, len(self._buffer))
+        buffer[:length] = self._buffer[:length]
+        del self._buffer[:length]
+        return length
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """
+    A ThreadedConnectionPool that waits for a connection to be returned when the pool is exhausted,
+    instead of raising psycopg2.pool.PoolError.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, *args, **kwargs):
+        self._available = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        self._available.acquire()
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        # A connection that was not checked out raises PoolError and must not free a slot
+        super().putconn(conn, key, close)
+        self._available.release()
+
+
+_pools: Dict[Tuple, BlockingConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(dbname: Optional[str], user: Optional[str], password: Optional[str], host: Optional[str],
+             port: Optional[int]) -> BlockingConnectionPool:
+    """
+    Return the process-wide connection pool for the given connection parameters, creating it on first use.
+
+    Args:
+        dbname (Optional[str]): The name of the database.
+        user (Optional[str]): The username for the database connection.
+        password (Optional[str]): The password for the database connection.
+        host (Optional[str]): The host address for the database connection.
+        port (Optional[int]): The port number for the database connection.
+
+    Returns:
+        BlockingConnectionPool: The shared connection pool.
+    """
+    key = (dbname, user, password, host, port)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = BlockingConnectionPool(POOL_MIN_CONN, POOL_MAX_CONN, dbname=dbname, user=user,
+                                          password=password, host=host, port=port)
+            _pools[key] = pool
+        return pool
+
+
+def close_pools() -> None:
+    """
+    Close all connections of all the connection pools, e.g. on shutdown.
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
+
 
 class DatabaseManager:
     """
     The DatabaseManager class is responsible for managing the database operations in the application.
     It provides methods to connect to the database, insert or update website data, and stream insert logs.
+    Connections are borrowed from a process-wide pool and returned to it when exiting the context manager scope.
 
     Attributes:
         dbname (str): The name of the database.
@@ -33,7 +210,7 @@ class DatabaseManager:
         password (str): The database password.
         host (str): The database host.
         port (int): The database port.
-        logger (Logger): A logger for database operations.
+        pool (BlockingConnectionPool): The connection pool the connection is borrowed from.
         conn (psycopg2.extensions.connection): The database connection object.
     """
 
@@ -66,10 +243,33 @@ class DatabaseManager:
         self.host = host if host is not None else os.getenv("POSTGRES_HOST")
         self.port = port if port is not None else os.getenv("POSTGRES_PORT")
 
-        self.logger = setup_logger('db_operations', 'db_operations.log')
+        self.pool = get_pool(self.dbname, self.user, self.password, self.host, self.port)
+        self.conn = self._checkout()
 
-        self.conn = psycopg2.connect(dbname=self.dbname, user=self.user, password=self.password,
-                                     host=self.host, port=self.port)
+    def _checkout(self) -> psycopg2.extensions.connection:
+        """
+        Borrows a connection from the pool and checks with a cheap query that the server is still there.
+        Pooled connections lost meanwhile, e.g. by a database restart, are discarded and replaced. At most
+        POOL_MIN_CONN connections are kept idle in the pool, so a fresh connection is tried after as many failures.
+
+        Returns:
+            psycopg2.extensions.connection: A working database connection.
+
+        Raises:
+            psycopg2.OperationalError: If no working connection can be made.
+            psycopg2.InterfaceError: If no working connection can be made.
+        """
+        for attempt in range(POOL_MIN_CONN + 1):
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1;")
+                conn.rollback()  # Don't leave the connection idle in the transaction opened by the check
+                return conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self.pool.putconn(conn, close=True)
+                if attempt == POOL_MIN_CONN:
+                    raise
 
     def __enter__(self):
         """
@@ -82,9 +282,10 @@ class DatabaseManager:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
-        Ensures the database connection is closed when exiting the context manager scope.
+        Ensures the database connection is returned to the pool when exiting the context manager scope.
+        An unfinished transaction is rolled back by the pool.
         """
-        self.conn.close()
+        self.pool.putconn(self.conn)
 
     @log_function_call(logger=db_logger)
     def upsert_website(self, url: str) -> int:
@@ -98,15 +299,48 @@ class DatabaseManager:
             int: The ID of the upserted website.
         """
         with self.conn.cursor() as cursor:
-            insert_sql = (f"INSERT INTO t_website (web_url) VALUES ('{url}') "
-                          f"ON CONFLICT (web_url) DO UPDATE SET web_url = EXCLUDED.web_url RETURNING web_id;")
-            cursor.execute(insert_sql)
+            # Bind the URL as a parameter instead of formatting it into the query to prevent SQL injection
+            insert_sql = ("INSERT INTO t_website (web_url) VALUES (%s) "
+                          "ON CONFLICT (web_url) DO UPDATE SET web_url = EXCLUDED.web_url RETURNING web_id;")
+            cursor.execute(insert_sql, (url,))
             web_id = cursor.fetchone()[0]
             self.conn.commit()
             return web_id
 
+    @log_function_call(logger=db_logger)
+    def upsert_websites(self, urls: List[str]) -> Dict[str, int]:
+        """
+        Upserts a batch of websites into the database.
+
+        The URLs are loaded into a temporary staging table with COPY and upserted from there with a single
+        INSERT ... SELECT, which keeps COPY throughput for large batches while still resolving conflicts.
+        The transaction is not committed here; the caller is responsible for committing it.
+
+        Args:
+            urls (List[str]): The URLs of the websites to be upserted. Duplicates are allowed.
+
+        Returns:
+            Dict[str, int]: A mapping of each URL to the ID of its upserted website.
+        """
+        unique_urls = set(urls)
+        if not unique_urls:
+            return {}
+
+        # csv.writer quotes the URLs for COPY in C, with a single call for the whole batch. Fields are only quoted when
+        # they contain a line terminator character, so the default '\r\n' terminator is kept to quote both \r and \n.
+        staged_urls = io.StringIO()
+        csv.writer(staged_urls).writerows((url,) for url in unique_urls)
+        staged_urls.seek(0)
+        with self.conn.cursor() as cursor:
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _stage_url (web_url text) ON COMMIT DELETE ROWS;")
+            cursor.copy_expert("COPY _stage_url (web_url) FROM STDIN WITH (FORMAT CSV)", staged_urls)
+            cursor.execute("INSERT INTO t_website (web_url) SELECT DISTINCT web_url FROM _stage_url "
+                           "ON CONFLICT (web_url) DO UPDATE SET web_url = EXCLUDED.web_url "
+                           "RETURNING web_id, web_url;")
+            return {web_url: web_id for web_id, web_url in cursor.fetchall()}
+
     def stream_insert_result(self, results: List[Tuple[str, float, int, Optional[str], int, str]],
-                             chunk_size: int = 1000) -> None:
+                             chunk_size: Optional[int] = None) -> None:
         """
         Streams and inserts the given results into the database.
 
@@ -120,45 +354,34 @@ class DatabaseManager:
                 - timestamp_data (int): The epoch timestamp data.
                 - detail_log (str): The detail log.
 
-            chunk_size (int, optional): The number of results to process in each chunk. Defaults to 1000.
+            chunk_size (int, optional): The number of results to insert with each COPY.
+                If not provided, it will be computed from the available memory with adaptive_chunk_size().
+                Defaults to None.
 
         Raises:
             Exception: If an error occurs during the streaming insert.
             psycopg2.DatabaseError: If a database error occurs during the streaming insert.
 
         """
+        if chunk_size is None:
+            chunk_size = adaptive_chunk_size()
+
         try:
-            modified_results = []
-            for result in results:
-                url, response_time, status_code, matched_content, timestamp_data, detail_log = result
-                web_id = self.upsert_website(url)
-                
-                # Ensure matched_content is a string or None for consistent handling
-                matched_content_str = matched_content if matched_content is not None else ''
-                
-                # Escape double quotes by doubling them
-                matched_content_escaped = matched_content_str.replace('"', '""')
-                modified_results.append((web_id, status_code, response_time, matched_content_escaped,
-                                         timestamp_data, detail_log))
+            # Resolve all website IDs in one round-trip instead of one upsert per result
+            web_ids = self.upsert_websites([result[0] for result in results])
+
+            modified_results = (
+                (web_ids[url], status_code, response_time, matched_content, timestamp_data, detail_log)
+                for url, response_time, status_code, matched_content, timestamp_data, detail_log in results
+            )
 
+            # Binary COPY skips text formatting on our side and parsing on the server side. Rows are encoded
+            # lazily while COPY reads the stream, so memory stays flat regardless of the chunk size.
             with self.conn.cursor() as cursor:
-                for i in range(0, len(modified_results), chunk_size):
-                    chunk = modified_results[i:i + chunk_size]
-                    csv_data = io.StringIO()
-                    
-                    # Properly format each log entry as a CSV line - We are doing this because streaming insert
-                    # to Postgres work with CSV stdin in the following query. We need to build CSV either in memory
-                    # with io.String or pysical CSV file directly
-                    for log_entry in chunk:
-                        # Convert each value to string, escape double quotes in strings
-                        csv_line = ','.join(
-                            f'"{value}"' if isinstance(value, str) else str(value) for value in log_entry)
-                        csv_data.write(csv_line + "\n")
-                    csv_data.seek(0)
-                    cursor.copy_expert(
-                        "COPY t_monitor (web_id, status_code, response_time, matched_content, check_ts, detail_log) "
-                        "FROM STDIN WITH CSV NULL ''", csv_data)
+                for _ in range(0, len(results), chunk_size):
+                    cursor.copy_expert(MONITOR_COPY_SQL,
+                                       MonitorCopyStream(itertools.islice(modified_results, chunk_size)))
                 self.conn.commit()
         except (Exception, psycopg2.DatabaseError) as error:
-            self.logger.exception("Error in streaming insert logs: %s", error)
+            db_logger.exception("Error in streaming insert logs: %s", error)
             raise
@@ -3,16 +3,49 @@ This module provides functions for setting up a logger with a rotating file hand
 and a decorator for logging function calls.
 """
 
+import atexit
+import inspect
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
-from functools import wraps
-from typing import Callable, Optional
+import queue
+from functools import lru_cache, wraps
+from typing import Callable, Dict, Optional
 
+LOG_MAX_BYTES = 10 * 1024 * 1024
 
+# Background threads writing the queued records of each logger to its rotating file
+_listeners: Dict[str, QueueListener] = {}
+
+
+def stop_listener(name: str) -> None:
+    """
+    Stop the background log writer of a logger, writing out the records still in its queue, and close its file.
+
+    Args:
+        name: The name of the logger.
+    """
+    listener = _listeners.pop(name)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+@atexit.register
+def stop_listeners() -> None:
+    """
+    Stop the background log writers of all loggers, writing out the records still in their queues.
+    """
+    for name in list(_listeners):
+        stop_listener(name)
+
+
+@lru_cache(maxsize=None)
 def setup_logger(name: str, log_file: str, level: int = logging.INFO) -> logging.Logger:
     """
-    Setup and return a logger with a rotating file handler.
+    Setup and return a logger with a rotating file handler. The logger only enqueues its records, and a background
+    thread writes them to the file, so that logging does not block the caller on disk I/O.
+    Repeated calls with the same arguments return the same logger without setting it up again.
     
     Args:
         name: The name of the logger.
@@ -27,17 +60,21 @@ def setup_logger(name: str, log_file: str, level: int = logging.INFO) -> logging
         os.makedirs('logs')
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    handler = RotatingFileHandler(f'logs/{log_file}', maxBytes=10000, backupCount=5)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
     if not logger.handlers:
-        logger.addHandler(handler)
+        handler = RotatingFileHandler(f'logs/{log_file}', maxBytes=LOG_MAX_BYTES, backupCount=5)
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        handler.setFormatter(formatter)
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, handler)
+        listener.start()
+        _listeners[name] = listener
+        logger.addHandler(QueueHandler(log_queue))
     return logger
 
 
 def log_function_call(logger: Optional[logging.Logger] = None) -> Callable:
     """
-    Decorator factory to log function calls.
+    Decorator factory to log function calls. Coroutine functions are logged when awaited.
     
     Args:
         logger: The logger instance to use. If None, the root logger is used.
@@ -50,6 +87,20 @@ def log_function_call(logger: Optional[logging.Logger] = None) -> Callable:
         logger = logging.getLogger()  # Use the root logger by default
 
     def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Callable:
+                logger.info(f"Entering: {func.__name__}")
+                try:
+                    result = await func(*args, **kwargs)
+                    logger.info(f"Exiting: {func.__name__}")
+                    return result
+                except Exception as e:
+                    logger.exception(f"Error in {func.__name__}: {e}")
+                    raise  # Re-raise the exception to not swallow it
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> Callable:
             logger.info(f"Entering: {func.__name__}")
@@ -1,69 +1,67 @@
 #!/usr/bin/env python3
 """
-This module monitors a list of websites continuously using multiple threads.
+This module monitors a list of websites continuously using asyncio tasks on a single uvloop event loop.
 """
 
-import time
-import threading
+import aiohttp
+import asyncio
 from datetime import datetime
-from typing import List, Generator
+from typing import List
 import multiprocessing
-from monitor_service import monitor_url
+import uvloop
+from monitor_service import monitor_url, start_result_flusher
 from logger import log_function_call, setup_logger
 from validator import is_connected, load_websites, Website
 
 main_logger = setup_logger('main', 'main.log')
 
+# Maximum number of simultaneous connections of the shared HTTP session
+MAX_CONNECTIONS = 200
+# Keep idle connections and DNS entries for the longest monitoring interval, so that polls of the same host reuse the
+# connection instead of doing a new TCP and TLS handshake each time
+KEEPALIVE_TIMEOUT = 300
+DNS_CACHE_TTL = 300
 
-@log_function_call(logger=main_logger)
-def chunk_websites(website_list: List[Website], chunk_size: int) -> Generator[List[Website], None, None]:
-    """
-    Split the list of websites into smaller chunks.
-
-    Args:
-        website_list: A list of Website objects.
-        chunk_size: The size of each chunk.
 
-    Yields:
-        A chunk of websites as a list.
+async def monitor_website_continuous(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                                     website: Website) -> None:
     """
-    for i in range(0, len(website_list), chunk_size):
-        yield website_list[i:i + chunk_size]
-
-
-def monitor_website_continuous(website: Website):
-    """
-    Monitor a single website continuously at specified intervals.
+    Monitor a single website continuously at specified intervals. Connectivity problems are not probed for
+    separately; they surface as failed checks of the website itself.
 
     Args:
+        session: The shared HTTP session to monitor the website with.
+        semaphore: Limits the number of websites being monitored at the same time.
         website: The Website object to monitor.
     """
     while True:
-        if not is_connected():
-            main_logger.error("(!!!) No internet connection.")
-            continue
         print(f"({datetime.now()}) Monitoring: {website.url}")
-        monitor_url(website.url, website.regex_pattern)
-        time.sleep(website.interval)
+        async with semaphore:
+            await monitor_url(session, website.url, website.compiled_pattern)
+        await asyncio.sleep(website.interval)
 
 
 @log_function_call(logger=main_logger)
-def monitor_websites_chunk(websites_chunk: List[Website]) -> None:
+async def monitor_websites(website_list: List[Website]) -> None:
     """
-    Monitor a chunk of websites using separate threads.
+    Monitor all websites concurrently, sharing one HTTP connection pool, and insert the results in the background.
 
     Args:
-        websites_chunk: A chunk of websites as a list.
+        website_list: A list of Website objects.
     """
-    for website in websites_chunk:
-        threading.Thread(target=monitor_website_continuous, args=(website,)).start()
+    start_result_flusher()
+    # Never let more requests through than the connector has connections, so that requests don't queue for a
+    # connection while their timeout is already running
+    semaphore = asyncio.Semaphore(min(multiprocessing.cpu_count() * 32, MAX_CONNECTIONS))
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, keepalive_timeout=KEEPALIVE_TIMEOUT,
+                                     ttl_dns_cache=DNS_CACHE_TTL)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(monitor_website_continuous(session, semaphore, website) for website in website_list))
 
 
 if __name__ == "__main__":
-    websites_data = load_websites('websites.json')
-    websites = [Website(data.url, data.interval, data.regex_pattern) for data in websites_data]
-    num_cores = multiprocessing.cpu_count()
-    websites_per_chunk = max(1, len(websites) // num_cores)
-
-    for chunk in chunk_websites(websites, websites_per_chunk):
-        threading.Thread(target=monitor_websites_chunk, args=(list(chunk),)).start()
+    websites = load_websites('websites.json')
+    if not is_connected():
+        main_logger.error("(!!!) No internet connection.")
+    # uvloop runs the event loop in C (libuv), which lowers the per-request overhead of many concurrent monitors
+    uvloop.run(monitor_websites(websites))
@@ -1,83 +1,192 @@
 """
 This module contains a function to monitor a single URL, fetch its content, optionally check against a regex pattern,
-extract matched content, and log the result along with the match (if any).
+extract matched content, and log the result along with the match (if any). The results are queued and inserted into
+the database in batches by a dedicated flusher thread.
 
 Example usage:
-    monitor_url("https://example.com", r"\\d{4}-\\d{2}-\\d{2}")
+    start_result_flusher()
+    async with aiohttp.ClientSession() as session:
+        await monitor_url(session, "https://example.com", compile_pattern(r"\\d{4}-\\d{2}-\\d{2}"))
 
 """
 
-import requests
+import aiohttp
+import asyncio
+import queue
+import threading
 import time
-from typing import Optional
-from regex_checker import check_content_and_extract
+from typing import List, Optional, Tuple, Union
+from regex_checker import CompiledPattern, check_content_and_extract, searches_utf8_bytes
 from database import DatabaseManager
 from http import HTTPStatus
 from logger import log_function_call, setup_logger
 
 monitor_logger = setup_logger('monitor_service', 'monitor_service.log')
-results = []  # Store the results to the list before inserting into the database
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+# Bodies declaring one of these charsets are searched as UTF-8 bytes
+UTF8_CHARSETS = {'utf-8', 'utf8', 'us-ascii', 'ascii'}
+# Bodies without a declared charset are decoded as ISO-8859-1 like requests does, instead of letting aiohttp detect
+# the charset, which is slow on large pages and would block the event loop
+FALLBACK_CHARSET = 'iso-8859-1'
+
+# The results are queued before inserting into the database. A batch is flushed when it reaches BATCH_SIZE rows or
+# FLUSH_INTERVAL seconds after its first row, whichever comes first.
+RESULTS_Q: queue.Queue = queue.Queue()
+BATCH_SIZE = 1000
+FLUSH_INTERVAL = 5.0
+
+_flusher: Optional[threading.Thread] = None
+_flusher_lock = threading.Lock()
+
+
+def insert_results(batch: List[Tuple]) -> None:
+    """
+    Insert a batch of results into the database with a pooled connection.
+
+    Args:
+        batch (List[Tuple]): The results to insert.
+    """
+    with DatabaseManager() as dbman:
+        dbman.stream_insert_result(batch)
+
+
+def drain_batch(batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL) -> List[Tuple]:
+    """
+    Block until a result is queued, then collect results until the batch is full or the flush interval has elapsed.
+
+    Args:
+        batch_size (int): The maximum number of results in the batch.
+        flush_interval (float): The maximum number of seconds to wait for the batch to fill up.
+
+    Returns:
+        List[Tuple]: The batch of results.
+    """
+    batch = [RESULTS_Q.get()]
+    deadline = time.monotonic() + flush_interval
+    while len(batch) < batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(RESULTS_Q.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def flush_results(batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL) -> None:
+    """
+    Insert the queued results into the database in batches, forever. A failed batch is logged and dropped so that
+    the flusher keeps running.
+
+    Args:
+        batch_size (int): The maximum number of results to insert at once.
+        flush_interval (float): The maximum number of seconds a result waits in the queue for its batch to fill up.
+    """
+    while True:
+        batch = drain_batch(batch_size, flush_interval)
+        try:
+            insert_results(batch)
+        except Exception as e:
+            monitor_logger.exception(f"Failed to insert {len(batch)} results: {e}")
+
+
+def start_result_flusher() -> threading.Thread:
+    """
+    Start the daemon thread which inserts the queued results into the database, unless it is already running.
+
+    Returns:
+        threading.Thread: The flusher thread.
+    """
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=flush_results, name='result-flusher', daemon=True)
+            _flusher.start()
+        return _flusher
+
+
+async def read_content(response: aiohttp.ClientResponse,
+                       regex_pattern: Optional[CompiledPattern]) -> Union[str, bytes]:
+    """
+    Read the response body to check against the regex pattern. The body is only decoded into a str when the pattern
+    cannot search its bytes directly, which saves a full-size decode and copy for pages declared as UTF-8 and matched
+    by RE2. The body is always read, so that the connection can be reused.
+
+    Args:
+        response (aiohttp.ClientResponse): The response to read.
+        regex_pattern (Optional[CompiledPattern]): Compiled regex pattern the content will be checked against.
+
+    Returns:
+        Union[str, bytes]: The raw body if it does not need decoding, the decoded body otherwise.
+    """
+    body = await response.read()
+    if regex_pattern is None:
+        return body
+    charset = response.charset
+    if searches_utf8_bytes(regex_pattern) and charset is not None and charset.lower() in UTF8_CHARSETS:
+        return body
+    # Like requests' text, replace undecodable bytes instead of failing the whole check
+    return await response.text(encoding=None if charset else FALLBACK_CHARSET, errors='replace')
 
 
 @log_function_call(logger=monitor_logger)
-def monitor_url(url: str, regex_pattern: Optional[str] = None, batch_size: int = 1000) -> None:
+async def monitor_url(session: aiohttp.ClientSession, url: str,
+                      regex_pattern: Optional[CompiledPattern] = None) -> None:
     """
     Monitor a single URL, fetch its content, optionally check against a regex pattern, extract matched content,
-    and log the result along with the match (if any).
+    and queue the result along with the match (if any) for insertion into the database.
 
     Args:
+        session (aiohttp.ClientSession): The shared HTTP session to send the request with.
         url (str): The URL to monitor.
-        regex_pattern (Optional[str]): Regex pattern to check in the URL content.
-        batch_size (int): The number of results to accumulate before inserting into the database.
+        regex_pattern (Optional[CompiledPattern]): Compiled regex pattern to check in the URL content.
 
     Raises:
-        requests.exceptions.Timeout: If the request to the URL times out.
-        requests.exceptions.TooManyRedirects: If there are too many redirects for the URL.
-        requests.exceptions.RequestException: If the request to the URL fails.
+        asyncio.TimeoutError: If the request to the URL times out.
+        aiohttp.TooManyRedirects: If there are too many redirects for the URL.
+        aiohttp.ClientError: If the request to the URL fails.
         Exception: If an unexpected error occurs.
 
     """
-    dbman = DatabaseManager()
     epoch_time = int(time.time())
-    global results
 
     try:
-        response = requests.get(url, timeout=10)
-        response_time = response.elapsed.total_seconds()
+        start_time = time.perf_counter()
+        async with session.get(url, timeout=REQUEST_TIMEOUT) as response:
+            # Like requests' elapsed, measure until the response headers are parsed
+            response_time = time.perf_counter() - start_time
 
-        pattern_found, matched_content = (False, None)
-        if response.status_code == HTTPStatus.OK:
-            pattern_found, matched_content = check_content_and_extract(response.text, regex_pattern)
+            pattern_found, matched_content = (False, None)
+            if response.status == HTTPStatus.OK:
+                content = await read_content(response, regex_pattern)
+                pattern_found, matched_content = check_content_and_extract(content, regex_pattern)
 
-            if not pattern_found and regex_pattern:
-                monitor_logger.warning(f"Pattern not found in URL {url}")
+                if not pattern_found and regex_pattern is not None:
+                    monitor_logger.warning(f"Pattern not found in URL {url}")
 
-        results.append((url, float(response_time), int(response.status_code), matched_content, epoch_time, ""))
+        RESULTS_Q.put((url, float(response_time), int(response.status), matched_content, epoch_time, ""))
 
         if matched_content:
             # Handle or log the matched content as needed
             monitor_logger.info(f"Matched content in URL {url}: {matched_content}")
 
-    except requests.exceptions.Timeout as e:
+    except asyncio.TimeoutError as e:
         monitor_logger.exception(f"Request timed out for {url}: {e}")
-        results.append((url, float(0), int(HTTPStatus.REQUEST_TIMEOUT.value), None, epoch_time,
-                        "Request timed out"))
+        RESULTS_Q.put((url, float(0), int(HTTPStatus.REQUEST_TIMEOUT.value), None, epoch_time,
+                       "Request timed out"))
 
-    except requests.exceptions.TooManyRedirects as e:
+    except aiohttp.TooManyRedirects as e:
         monitor_logger.exception(f"Too many redirects for {url}: {e}")
-        results.append((url, float(0), int(HTTPStatus.MULTIPLE_CHOICES.value), None, epoch_time,
-                        "Too many redirects"))
+        RESULTS_Q.put((url, float(0), int(HTTPStatus.MULTIPLE_CHOICES.value), None, epoch_time,
+                       "Too many redirects"))
 
-    except requests.exceptions.RequestException as e:
+    except aiohttp.ClientError as e:
         monitor_logger.exception(f"Request failed for {url}: {e}")
-        results.append((url, float(0), int(HTTPStatus.SERVICE_UNAVAILABLE.value), None, epoch_time,
-                        "Request failed, service unavailable"))
+        RESULTS_Q.put((url, float(0), int(HTTPStatus.SERVICE_UNAVAILABLE.value), None, epoch_time,
+                       "Request failed, service unavailable"))
 
     except Exception as e:
         monitor_logger.exception(f"Unexpected error for {url}: {e}")
-        results.append((url, float(0), int(0), None, epoch_time, "Unexpected error"))
+        RESULTS_Q.put((url, float(0), int(0), None, epoch_time, "Unexpected error"))
 
-    # Insert results into the database if the batch size is reached
-    if len(results) >= batch_size:
-        dbman.stream_insert_result(results)
-        results.clear()
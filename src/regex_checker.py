@@ -1,27 +1,89 @@
 """
 A module for checking content against a regex pattern and extracting the matched content.
 
-This module provides a function `check_content_and_extract` that takes a text content and a regex pattern as input.
-It checks if the given regex pattern is found in the content and extracts the matched content.
+This module provides a function `check_content_and_extract` that takes a text content and a compiled regex pattern as
+input. It checks if the given regex pattern is found in the content and extracts the matched content.
+Patterns are compiled with `compile_pattern`, which uses Google RE2 to match in linear time of the content size.
+RE2 patterns can search UTF-8 encoded content directly, without decoding it first.
 
 Example usage:
     content = "Hello, world!"
-    pattern = r"Hello"
+    pattern = compile_pattern(r"Hello")
     result = check_content_and_extract(content, pattern)
     print(result)  # (True, "Hello")
 """
 
 import re
-from typing import Optional, Tuple
+import re2
+from typing import Any, Optional, Protocol, Tuple, Union
 
 
-def check_content_and_extract(content: str, pattern: Optional[str]) -> Tuple[bool, Optional[str]]:
+class CompiledPattern(Protocol):
+    """
+    The search interface shared by patterns compiled with Python's re and with RE2.
+    """
+
+    def search(self, content: Any) -> Any:
+        ...
+
+
+_RE2_OPTIONS = re2.Options()
+_RE2_OPTIONS.log_errors = False  # Unsupported patterns fall back to re, no need to log them as errors
+
+# Constructs RE2 interprets differently from Python's re: `$` does not match before a trailing newline, the
+# `\w \d \s \b` classes and their negations are ASCII-only, `{,n}` is a literal and `[[:` starts a POSIX class
+_RE2_INCOMPATIBLE = re.compile(r'\$|\\[wWdDsSbB]|\{,|\[\[:')
+
+
+def compile_pattern(pattern: str) -> CompiledPattern:
+    """
+    Compile a regex pattern with RE2, which cannot backtrack catastrophically on large contents. The pattern is
+    validated with Python's re, so the same patterns are accepted as before. Patterns which RE2 would match
+    differently, or which use features RE2 does not support such as backreferences and lookarounds, are compiled
+    with Python's re instead.
+
+    Args:
+        pattern: The regex pattern to compile.
+
+    Returns:
+        The compiled pattern, with the same search interface for both engines.
+
+    Raises:
+        re.error: If the pattern is not a valid regex pattern.
+    """
+    compiled = re.compile(pattern)
+    if _RE2_INCOMPATIBLE.search(pattern):
+        return compiled
+    try:
+        return re2.compile(pattern, _RE2_OPTIONS)
+    except re2.error:
+        return compiled
+
+
+def searches_utf8_bytes(pattern: CompiledPattern) -> bool:
+    """
+    Check if the pattern matches UTF-8 encoded bytes the same way as the decoded text. This holds for RE2, which
+    works on UTF-8 internally, but not for Python's re.
+
+    Args:
+        pattern: The compiled regex pattern.
+
+    Returns:
+        True if UTF-8 encoded content can be searched without decoding it, False otherwise.
+    """
+    # Only re.Pattern is public API, the class of RE2 patterns is private to the re2 module
+    return not isinstance(pattern, re.Pattern)
+
+
+def check_content_and_extract(content: Union[str, bytes],
+                              pattern: Optional[CompiledPattern]) -> Tuple[bool, Optional[str]]:
     """
     Check if the given regex pattern is found in the content and extract the matched content.
 
     Args:
-        content: The text content to search within.
-        pattern: The regex pattern to search for. If None, the function considers the check passed without searching.
+        content: The text content to search within, or its UTF-8 encoding if `searches_utf8_bytes(pattern)`.
+        pattern: The compiled regex pattern to search for. If None, the function considers the check passed without
+            searching.
 
     Returns:
         A tuple where the first element indicates whether the pattern was found (bool),
@@ -31,9 +93,12 @@ def check_content_and_extract(content: str, pattern: Optional[str]) -> Tuple[boo
     if pattern is None:
         return True, None
 
-    match = re.search(pattern, content)
+    match = pattern.search(content)
     if match:
-        # Returns the entire match
-        return True, match.group(0)
+        # Returns the entire match, only decoding the matched part of byte content
+        matched_content = match.group(0)
+        if isinstance(matched_content, bytes):
+            matched_content = matched_content.decode('utf-8', errors='replace')
+        return True, matched_content
 
     return False, None
@@ -1,42 +1,162 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from database import DatabaseManager
+import csv
+import psycopg2
+import psycopg2.pool
+import struct
+import threading
+from database import (BlockingConnectionPool, DatabaseManager, POOL_MIN_CONN, close_pools, MonitorCopyStream,
+                      adaptive_chunk_size, PGCOPY_HEADER, PGCOPY_TRAILER, encode_monitor_row)
 
 
 class TestDatabaseManager(unittest.TestCase):
-    @patch('psycopg2.connect')
+    def tearDown(self):
+        close_pools()
+
+    @patch('psycopg2.connect', **{'return_value.closed': 0})
     def test_init(self, mock_connect):
         db_manager = DatabaseManager(dbname='test_db', user='test_user', password='test_pass', host='localhost',
                                      port=5432)
-        mock_connect.assert_called_once_with(dbname='test_db', user='test_user', password='test_pass', host='localhost',
-                                             port=5432)
+        mock_connect.assert_called_with(dbname='test_db', user='test_user', password='test_pass', host='localhost',
+                                        port=5432)
+        self.assertIs(db_manager.conn, mock_connect.return_value)
 
-    @patch('psycopg2.connect')
+    @patch('psycopg2.connect', **{'return_value.closed': 0})
     def test_context_manager(self, mock_connect):
         with DatabaseManager() as db_manager:
             self.assertIsNotNone(db_manager)
-        mock_connect.return_value.close.assert_called_once()
+        with DatabaseManager() as db_manager:
+            self.assertIsNotNone(db_manager)
+        # The pool is opened once and the connection is returned to it instead of being closed
+        self.assertEqual(mock_connect.call_count, POOL_MIN_CONN)
+        mock_connect.return_value.close.assert_not_called()
+
+    @patch('psycopg2.connect')
+    def test_lost_connection_is_replaced(self, mock_connect):
+        lost_conn, open_conn = MagicMock(closed=0), MagicMock(closed=0)
+        lost_conn.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError
+        mock_connect.side_effect = [lost_conn, open_conn]
+        with patch('database.POOL_MIN_CONN', 1):
+            with DatabaseManager() as db_manager:
+                self.assertIs(db_manager.conn, open_conn)
+        lost_conn.close.assert_called_once()
+        open_conn.cursor.return_value.__enter__.return_value.execute.assert_called_once_with("SELECT 1;")
 
     @patch('psycopg2.connect')
+    def test_checkout_gives_up_without_working_connection(self, mock_connect):
+        mock_connect.return_value.cursor.return_value.__enter__.return_value.execute.side_effect = \
+            psycopg2.InterfaceError
+        with self.assertRaises(psycopg2.InterfaceError):
+            DatabaseManager()
+        self.assertEqual(mock_connect.return_value.close.call_count, POOL_MIN_CONN + 1)
+
+    def test_blocking_pool_waits_for_connection(self):
+        with patch('psycopg2.connect'):
+            pool = BlockingConnectionPool(1, 1)
+            conn = pool.getconn()
+            threading.Timer(0.1, pool.putconn, args=(conn,)).start()
+            self.assertIs(pool.getconn(), conn)
+            pool.closeall()
+
+    def test_blocking_pool_rejects_unknown_connection(self):
+        with patch('psycopg2.connect'):
+            pool = BlockingConnectionPool(1, 1)
+            conn = pool.getconn()
+            pool.putconn(conn)
+            # Returning the connection twice raises the pool's error instead of over-releasing the semaphore
+            with self.assertRaises(psycopg2.pool.PoolError):
+                pool.putconn(conn)
+            self.assertIs(pool.getconn(), conn)
+            pool.closeall()
+
+    @patch('psycopg2.connect', **{'return_value.closed': 0})
     def test_upsert_website(self, mock_connect):
         mock_cursor = MagicMock()
         mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_cursor
         mock_cursor.fetchone.return_value = [1]
 
         with DatabaseManager() as db_manager:
-            web_id = db_manager.upsert_website('https://example.com')
+            web_id = db_manager.upsert_website("https://example.com'); DROP TABLE t_website; --")
             self.assertEqual(web_id, 1)
+            query, params = mock_cursor.execute.call_args[0]
+            self.assertNotIn('DROP TABLE', query)
+            self.assertEqual(params, ("https://example.com'); DROP TABLE t_website; --",))
 
-    @patch('psycopg2.connect')
+    @patch('psycopg2.connect', **{'return_value.closed': 0})
+    def test_upsert_websites(self, mock_connect):
+        mock_cursor = MagicMock()
+        mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = [(1, 'https://example.com'), (2, 'https://example.org')]
+
+        with DatabaseManager() as db_manager:
+            web_ids = db_manager.upsert_websites(['https://example.com', 'https://example.org',
+                                                  'https://example.com'])
+            self.assertEqual(web_ids, {'https://example.com': 1, 'https://example.org': 2})
+            mock_cursor.copy_expert.assert_called_once()
+            copy_sql, staged_urls = mock_cursor.copy_expert.call_args[0]
+            self.assertIn("_stage_url", copy_sql)
+            self.assertEqual(sorted(staged_urls.read().splitlines()), ['https://example.com', 'https://example.org'])
+
+    @patch('psycopg2.connect', **{'return_value.closed': 0})
+    def test_upsert_websites_quotes_copy_csv(self, mock_connect):
+        mock_cursor = MagicMock()
+        mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_cursor
+
+        with DatabaseManager() as db_manager:
+            db_manager.upsert_websites(['https://example.com/a\\b,"c"\nd\re'])
+            copy_sql, staged_urls = mock_cursor.copy_expert.call_args[0]
+            self.assertIn("FORMAT CSV", copy_sql)
+            self.assertEqual(staged_urls.read(), '"https://example.com/a\\b,""c""\nd\re"\r\n')
+            staged_urls.seek(0)
+            self.assertEqual(list(csv.reader(staged_urls)), [['https://example.com/a\\b,"c"\nd\re']])
+
+    @patch('psycopg2.connect', **{'return_value.closed': 0})
     def test_stream_insert_result(self, mock_connect):
         mock_cursor = MagicMock()
         mock_connect.return_value.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = [1]
+        mock_cursor.fetchall.return_value = [(1, 'https://example.com')]
 
         with DatabaseManager() as db_manager:
-            logs = [("https://example.com", 0.5, 200, "content", 1234567890, "log details")]
+            logs = [("https://example.com", 0.5, 200, 'say "hi", then\nleave', 1234567890, "log details")]
             db_manager.stream_insert_result(logs)
-            mock_cursor.copy_expert.assert_called_once()
+            self.assertEqual(mock_cursor.copy_expert.call_count, 2)
+            copy_sql, copy_data = mock_cursor.copy_expert.call_args[0]
+            self.assertIn("FORMAT BINARY", copy_sql)
+            self.assertEqual(copy_data.read(),
+                             PGCOPY_HEADER + encode_monitor_row((1, 200, 0.5, 'say "hi", then\nleave', 1234567890,
+                                                                 "log details")) + PGCOPY_TRAILER)
+            mock_connect.return_value.commit.assert_called_once()
+
+    def test_encode_monitor_row(self):
+        encoded = encode_monitor_row((1, 200, 0.5, None, 1234567890, "ok"))
+        expected = (struct.pack('!h', 6) + struct.pack('!iq', 8, 1) + struct.pack('!ih', 2, 200)
+                    + struct.pack('!id', 8, 0.5) + struct.pack('!i', -1) + struct.pack('!iq', 8, 1234567890)
+                    + struct.pack('!i', 2) + b'ok')
+        self.assertEqual(encoded, expected)
+
+    def test_monitor_copy_stream(self):
+        rows = [(web_id, 200, 0.5, "content", 1234567890, "") for web_id in range(100)]
+        expected = PGCOPY_HEADER + b''.join(encode_monitor_row(row) for row in rows) + PGCOPY_TRAILER
+
+        stream = MonitorCopyStream(iter(rows))
+        chunks = []
+        while chunk := stream.read(64):
+            self.assertLessEqual(len(chunk), 64)
+            chunks.append(chunk)
+        self.assertEqual(b''.join(chunks), expected)
+
+    @patch('database.psutil.virtual_memory')
+    def test_adaptive_chunk_size(self, mock_virtual_memory):
+        gib = 1024 ** 3
+        mock_virtual_memory.return_value = MagicMock(total=16 * gib, available=12 * gib)
+        self.assertEqual(adaptive_chunk_size(), 20000)
+
+        # 75% pressure shrinks the chunk to a quarter of the memory share
+        mock_virtual_memory.return_value = MagicMock(total=160 * 1024 ** 2, available=40 * 1024 ** 2)
+        self.assertEqual(adaptive_chunk_size(), 1024)
+
+        mock_virtual_memory.return_value = MagicMock(total=16 * gib, available=10 * 1024 ** 2)
+        self.assertEqual(adaptive_chunk_size(), 500)
 
 
 if __name__ == '__main__':
@@ -1,10 +1,34 @@
+import asyncio
+import logging
+import os
 import unittest
+from logging.handlers import QueueHandler
 from unittest.mock import patch
-from logger import setup_logger, log_function_call
+from logger import setup_logger, log_function_call, stop_listener
 
 
 class TestLogger(unittest.TestCase):
 
+    def test_setup_logger_writes_in_background(self):
+        logger = setup_logger('test_queued_logger', 'test_queued_logger.log')
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertIsInstance(logger.handlers[0], QueueHandler)
+
+        logger.info("Queued message")
+        # Stopping the listener writes out the queued records
+        stop_listener('test_queued_logger')
+        with open(os.path.join('logs', 'test_queued_logger.log')) as log_file:
+            self.assertTrue(log_file.read().rstrip().endswith("INFO - Queued message"))
+        logging.getLogger('test_queued_logger').handlers.clear()
+        # Don't let later setup_logger calls return the cached logger without its handler
+        setup_logger.cache_clear()
+
+    @patch('logger.os.path.exists', return_value=True)
+    def test_setup_logger_is_cached(self, mock_exists):
+        logger = setup_logger('test_cached_logger', 'test_logger.log')
+        self.assertIs(setup_logger('test_cached_logger', 'test_logger.log'), logger)
+        mock_exists.assert_called_once()
+
     def test_log_function_call(self):
         # Setup a test logger
         logger = setup_logger('test_logger', 'test_logger.log')
@@ -31,6 +55,21 @@ class TestLogger(unittest.TestCase):
 
             mock_exception.assert_called_once_with("Error in sample_function_exception: Test exception")
 
+    def test_log_coroutine_call(self):
+        logger = setup_logger('test_logger', 'test_logger.log')
+
+        with patch.object(logger, 'info') as mock_info:
+            @log_function_call(logger=logger)
+            async def sample_coroutine(param):
+                mock_info.assert_called_once_with("Entering: sample_coroutine")
+                return f"Result is {param}"
+
+            # Nothing is logged until the coroutine is awaited
+            coroutine = sample_coroutine(42)
+            mock_info.assert_not_called()
+            self.assertEqual(asyncio.run(coroutine), "Result is 42")
+            mock_info.assert_called_with("Exiting: sample_coroutine")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,10 +1,12 @@
+import aiohttp
+import asyncio
 import unittest
-from unittest.mock import patch
-from main import chunk_websites, monitor_websites_chunk
+from unittest.mock import patch, AsyncMock, MagicMock
+from main import KEEPALIVE_TIMEOUT, MAX_CONNECTIONS, monitor_website_continuous, monitor_websites
 from validator import Website
 
 
-class TestMainModule(unittest.TestCase):
+class TestMainModule(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
         # Setup mock data
@@ -13,18 +15,40 @@ class TestMainModule(unittest.TestCase):
             Website("https://bing.com", 15, "Ask"),
         ]
 
-    def test_chunk_websites(self):
-        # Test if websites are correctly chunked.
-        chunks = list(chunk_websites(self.websites, 1))
-        self.assertEqual(len(chunks), 2)
-        self.assertEqual(chunks[0][0].url, "https://google.com")
-        self.assertEqual(chunks[1][0].url, "https://bing.com")
-
-    @patch('main.monitor_website_continuous')
-    def test_monitor_websites_chunk(self, mock_monitor_website_continuous):
-        # Test if separate threads are started for each website in a chunk.
-        monitor_websites_chunk(self.websites)
-        self.assertEqual(mock_monitor_website_continuous.call_count, 2)
+    @patch('main.aiohttp.TCPConnector', wraps=aiohttp.TCPConnector)
+    @patch('main.start_result_flusher')
+    @patch('main.monitor_website_continuous', new_callable=AsyncMock)
+    async def test_monitor_websites(self, mock_monitor_website_continuous, mock_start_result_flusher, mock_connector):
+        # Test if a task is started for each website, all sharing the same session.
+        await monitor_websites(self.websites)
+        mock_start_result_flusher.assert_called_once()
+        self.assertEqual(mock_monitor_website_continuous.await_count, 2)
+        sessions = {call.args[0] for call in mock_monitor_website_continuous.await_args_list}
+        self.assertEqual(len(sessions), 1)
+        # Idle connections are kept alive between polls
+        self.assertEqual(mock_connector.call_args.kwargs['keepalive_timeout'], KEEPALIVE_TIMEOUT)
+        self.assertEqual([call.args[2] for call in mock_monitor_website_continuous.await_args_list], self.websites)
+
+    @patch('main.multiprocessing.cpu_count', return_value=64)
+    @patch('main.start_result_flusher')
+    @patch('main.monitor_website_continuous', new_callable=AsyncMock)
+    async def test_monitor_websites_gate_fits_connector(self, mock_monitor_website_continuous,
+                                                        mock_start_result_flusher, mock_cpu_count):
+        # Test if no more requests pass the gate than the connector has connections, whatever the core count.
+        await monitor_websites(self.websites)
+        semaphore = mock_monitor_website_continuous.await_args.args[1]
+        self.assertEqual(semaphore._value, MAX_CONNECTIONS)
+
+    @patch('main.asyncio.sleep', new_callable=AsyncMock)
+    @patch('main.monitor_url', new_callable=AsyncMock, side_effect=[None, asyncio.CancelledError])
+    @patch('validator.session.get')
+    async def test_monitor_website_continuous(self, mock_probe, mock_monitor_url, mock_sleep):
+        # Test if the website is polled at its interval without probing the internet connection in between.
+        with self.assertRaises(asyncio.CancelledError):
+            await monitor_website_continuous(MagicMock(), asyncio.Semaphore(1), self.websites[1])
+        self.assertEqual(mock_monitor_url.await_count, 2)
+        mock_sleep.assert_awaited_once_with(15)
+        mock_probe.assert_not_called()
 
 
 if __name__ == '__main__':
@@ -1,40 +1,123 @@
+import asyncio
+import queue
+import re
 import unittest
-from unittest.mock import patch, MagicMock
-from monitor_service import monitor_url
+from unittest.mock import patch, MagicMock, AsyncMock
+from monitor_service import RESULTS_Q, drain_batch, flush_results, monitor_url, read_content
+from regex_checker import compile_pattern
 from http import HTTPStatus
-import requests
 
 
-class TestMonitorService(unittest.TestCase):
+def mock_response(status=HTTPStatus.OK, text='', charset='utf-8', body=None):
+    response = MagicMock(status=status, charset=charset)
+    body = text.encode(charset or 'utf-8') if body is None else body
+    response.read = AsyncMock(return_value=body)
+    # Decode like aiohttp's ClientResponse.text, which uses the declared charset unless an encoding is given
+    response.text = AsyncMock(side_effect=lambda encoding=None, errors='strict': body.decode(
+        encoding or charset or 'utf-8', errors))
+    return response
+
+
+def mock_session(status=HTTPStatus.OK, text='', side_effect=None, body=None):
+    # session.get() returns an async context manager that yields the response
+    session = MagicMock()
+    response = mock_response(status, text, body=body)
+    session.get.return_value.__aenter__ = AsyncMock(return_value=response, side_effect=side_effect)
+    session.get.return_value.__aexit__ = AsyncMock(return_value=False)
+    return session
+
+
+class TestMonitorService(unittest.IsolatedAsyncioTestCase):
+
+    def tearDown(self):
+        with RESULTS_Q.mutex:
+            RESULTS_Q.queue.clear()
 
-    @patch('monitor_service.DatabaseManager')
     @patch('monitor_service.check_content_and_extract', return_value=(True, 'Matched Content'))
-    @patch('monitor_service.requests.get')
-    def test_monitor_url_success_with_match(self, mock_get, mock_check, mock_db):
-        # Setup mock response for requests.get
-        mock_response = MagicMock()
-        mock_response.status_code = HTTPStatus.OK
-        mock_response.elapsed.total_seconds.return_value = 0.5
-        mock_response.text = 'Data Engineer'
-        mock_get.return_value = mock_response
+    async def test_monitor_url_success_with_match(self, mock_check):
+        session = mock_session(text='Data Engineer')
 
         # Execute the function under test
-        monitor_url("https://canartuc.com", r"Data")
+        pattern = re.compile(r"Data")
+        await monitor_url(session, "https://canartuc.com", pattern)
 
         # Assertions
-        mock_get.assert_called_once_with("https://canartuc.com", timeout=10)
-        mock_check.assert_called_once_with('Data Engineer', r"Data")
-        mock_db.return_value.stream_insert_result.assert_called()
+        session.get.assert_called_once()
+        self.assertEqual(session.get.call_args.args, ("https://canartuc.com",))
+        mock_check.assert_called_once_with('Data Engineer', pattern)
+        url, _, status_code, matched_content, _, _ = RESULTS_Q.get_nowait()
+        self.assertEqual((url, status_code, matched_content),
+                         ("https://canartuc.com", HTTPStatus.OK, 'Matched Content'))
 
-    @patch('monitor_service.DatabaseManager')
     @patch('monitor_service.check_content_and_extract', return_value=(False, None))
-    @patch('monitor_service.requests.get', side_effect=requests.exceptions.Timeout)
-    def test_monitor_url_timeout(self, mock_get, mock_check, mock_db):
-        monitor_url("http://tirafikimirafiki.com/", None)
+    async def test_monitor_url_timeout(self, mock_check):
+        session = mock_session(side_effect=asyncio.TimeoutError)
+
+        await monitor_url(session, "http://tirafikimirafiki.com/", None)
 
-        mock_get.assert_called_once_with("http://tirafikimirafiki.com/", timeout=10)
+        session.get.assert_called_once()
         mock_check.assert_not_called()
-        mock_db.return_value.stream_insert_result.assert_called_once()
+        self.assertEqual(RESULTS_Q.get_nowait()[2], HTTPStatus.REQUEST_TIMEOUT)
+
+    async def test_monitor_url_invalid_byte_in_body(self):
+        # A stray byte in a UTF-8 page is replaced instead of failing the check
+        session = mock_session(body=b'caf\xe9 2024-05-01')
+
+        await monitor_url(session, "https://canartuc.com", compile_pattern(r"caf. \d{4}-\d{2}-\d{2}"))
+
+        _, _, status_code, matched_content, _, detail_log = RESULTS_Q.get_nowait()
+        self.assertEqual((status_code, matched_content, detail_log), (HTTPStatus.OK, 'caf\ufffd 2024-05-01', ""))
+
+    @patch('monitor_service.DatabaseManager')
+    async def test_monitor_url_does_not_connect_to_database(self, mock_db):
+        # Only the flusher thread touches the database, once per batch
+        await monitor_url(mock_session(text='Data Engineer'), "https://canartuc.com")
+        mock_db.assert_not_called()
+        self.assertEqual(RESULTS_Q.qsize(), 1)
+
+    @patch('monitor_service.DatabaseManager')
+    def test_flush_results_connects_once_per_batch(self, mock_db):
+        for i in range(3):
+            RESULTS_Q.put((i,))
+        mock_db.return_value.__enter__.return_value.stream_insert_result.side_effect = [None, SystemExit]
+
+        with self.assertRaises(SystemExit):
+            flush_results(batch_size=2, flush_interval=0)
+        self.assertEqual(mock_db.call_count, 2)
+
+    async def test_read_content(self):
+        # RE2 patterns search UTF-8 bodies without decoding them
+        response = mock_response(text='Grüße')
+        self.assertEqual(await read_content(response, compile_pattern(r"Gr.+e")), 'Grüße'.encode())
+        response.text.assert_not_awaited()
+
+        # Python re patterns and other charsets need the decoded body
+        self.assertEqual(await read_content(mock_response(text='Grüße'), re.compile(r"(ß)\1")), 'Grüße')
+        self.assertEqual(await read_content(mock_response(text='Grüße', charset='utf-16'), compile_pattern(r"Gr")),
+                         'Grüße')
+        # Without a declared charset, the body is decoded as ISO-8859-1 instead of detecting the charset
+        response = mock_response(charset=None, body='Grüße'.encode('latin-1'))
+        self.assertEqual(await read_content(response, compile_pattern(r"Gr")), 'Grüße')
+        response.text.assert_awaited_once_with(encoding='iso-8859-1', errors='replace')
+
+    def test_drain_batch(self):
+        for i in range(5):
+            RESULTS_Q.put((i,))
+
+        # A full batch is returned without waiting for the flush interval
+        self.assertEqual(drain_batch(batch_size=3, flush_interval=60), [(0,), (1,), (2,)])
+        # A partial batch is returned once the flush interval has elapsed
+        self.assertEqual(drain_batch(batch_size=3, flush_interval=0.05), [(3,), (4,)])
+
+    @patch('monitor_service.insert_results', side_effect=[Exception("connection lost"), None, SystemExit])
+    def test_flush_results_survives_failed_batch(self, mock_insert_results):
+        for i in range(3):
+            RESULTS_Q.put((i,))
+
+        with self.assertRaises(SystemExit):
+            flush_results(batch_size=1, flush_interval=0)
+        self.assertEqual([call.args[0] for call in mock_insert_results.call_args_list], [[(0,)], [(1,)], [(2,)]])
+        self.assertRaises(queue.Empty, RESULTS_Q.get_nowait)
 
 
 if __name__ == '__main__':
@@ -1,14 +1,16 @@
+import re
 import unittest
-from regex_checker import check_content_and_extract
+import warnings
+from regex_checker import check_content_and_extract, compile_pattern, searches_utf8_bytes
 
 
 class RegexCheckerTests(unittest.TestCase):
     def test_pattern_found(self):
-        result = check_content_and_extract("Hello, world!", r"Hello")
+        result = check_content_and_extract("Hello, world!", re.compile(r"Hello"))
         self.assertEqual(result, (True, "Hello"))
 
     def test_pattern_not_found(self):
-        result = check_content_and_extract("Hello, world!", r"Goodbye")
+        result = check_content_and_extract("Hello, world!", re.compile(r"Goodbye"))
         self.assertEqual(result, (False, None))
 
     def test_pattern_is_none(self):
@@ -16,13 +18,60 @@ class RegexCheckerTests(unittest.TestCase):
         self.assertEqual(result, (True, None))
 
     def test_content_is_empty(self):
-        result = check_content_and_extract("", r"Hello")
+        result = check_content_and_extract("", re.compile(r"Hello"))
         self.assertEqual(result, (False, None))
 
     def test_both_content_and_pattern_are_empty(self):
-        result = check_content_and_extract("", "")
+        result = check_content_and_extract("", re.compile(""))
         self.assertEqual(result, (True, ""))
 
+    def test_compile_pattern_uses_re2(self):
+        pattern = compile_pattern(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+        self.assertNotIsInstance(pattern, re.Pattern)
+        self.assertTrue(searches_utf8_bytes(pattern))
+        self.assertEqual(check_content_and_extract("Date: 2024-05-01", pattern), (True, "2024-05-01"))
+
+    def test_utf8_bytes_content(self):
+        pattern = compile_pattern(r"Gr.(ß|ss)e")
+        self.assertTrue(searches_utf8_bytes(pattern))
+        self.assertEqual(check_content_and_extract("Viele Grüße".encode(), pattern), (True, "Grüße"))
+        self.assertFalse(searches_utf8_bytes(re.compile(r"Gr")))
+
+    def test_compile_pattern_falls_back_to_re(self):
+        # Backreferences are not supported by RE2
+        pattern = compile_pattern(r"(l)\1")
+        self.assertIsInstance(pattern, re.Pattern)
+        self.assertEqual(check_content_and_extract("Hello", pattern), (True, "ll"))
+
+    def test_compile_pattern_keeps_re_semantics(self):
+        # Patterns which RE2 would match differently are compiled with re
+        cases = [
+            (r"ok$", "status ok\n", "ok"),  # RE2's $ does not match before a trailing newline
+            (r"\w+@\w+", "josé@exämple", "josé@exämple"),  # RE2's \w, \d, \s and \b are ASCII-only
+            (r"a\sb", "a\xa0b", "a\xa0b"),
+            (r"\bé", "x é", "é"),
+            (r"a{,3}x", "aax", "aax"),  # RE2 reads {,n} as a literal
+        ]
+        for pattern, content, expected in cases:
+            with self.subTest(pattern=pattern):
+                compiled = compile_pattern(pattern)
+                self.assertIsInstance(compiled, re.Pattern)
+                self.assertEqual(check_content_and_extract(content, compiled), (True, expected))
+
+        # RE2 reads [[: as a POSIX class, re as a set followed by "]"
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', FutureWarning)
+            compiled = compile_pattern(r"[[:alpha:]]")
+        self.assertIsInstance(compiled, re.Pattern)
+        self.assertEqual(check_content_and_extract("a:]", compiled), (True, ":]"))
+
+    def test_compile_pattern_invalid(self):
+        # Patterns only RE2 accepts are still rejected
+        for pattern in (r"(", r"\pL", r"\C"):
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(re.error):
+                    compile_pattern(pattern)
+
 
 if __name__ == '__main__':
     unittest.main()
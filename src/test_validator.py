@@ -0,0 +1,57 @@
+import dataclasses
+import json
+import os
+import tempfile
+import unittest
+from validator import Website, load_websites
+
+
+class TestWebsite(unittest.TestCase):
+
+    def test_website_is_frozen(self):
+        website = Website("https://google.com", 10, "Example")
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            website.interval = 20
+
+    def test_website_has_slots(self):
+        website = Website("https://google.com", 10, "Example")
+        self.assertFalse(hasattr(website, '__dict__'))
+
+    def test_website_compiled_pattern(self):
+        website = Website("https://google.com", 10, r"Exa.ple")
+        self.assertEqual(website.compiled_pattern.search("An Example page").group(0), "Example")
+        self.assertIsNone(Website("https://google.com", 10).compiled_pattern)
+        # The compiled pattern is not part of the comparison
+        self.assertEqual(website, Website("https://google.com", 10, r"Exa.ple"))
+
+    def test_website_invalid_pattern(self):
+        with self.assertRaises(ValueError):
+            Website("https://google.com", 10, "(")
+
+
+class TestLoadWebsites(unittest.TestCase):
+
+    def load(self, websites_data):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file:
+            json.dump(websites_data, file)
+        self.addCleanup(os.remove, file.name)
+        return load_websites(file.name)
+
+    def test_load_websites(self):
+        websites = self.load([
+            {"url": "https://google.com", "interval": 10, "regex_pattern": "Example"},
+            {"url": "https://bing.com", "interval": 5},
+        ])
+        self.assertEqual(websites, [Website("https://google.com", 10, "Example"), Website("https://bing.com", 5)])
+
+    def test_load_websites_rejects_unknown_key(self):
+        with self.assertRaises(TypeError):
+            self.load([{"url": "https://google.com", "interval": 10, "regex": "Example"}])
+
+    def test_load_websites_rejects_missing_key(self):
+        with self.assertRaises(TypeError):
+            self.load([{"url": "https://google.com"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
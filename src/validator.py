@@ -9,26 +9,33 @@ The module also includes the following class:
 - Website: A class representing a website to be monitored.
 """
 
-import json
+import orjson
 import re
 import requests
 from dataclasses import dataclass, field
 from typing import List, Optional
 from urllib.parse import urlparse
 from logger import setup_logger, log_function_call
+from regex_checker import CompiledPattern, compile_pattern
 
 logger = setup_logger('validator', 'validator.log')
 
+# Shared session, so that connection checks reuse a kept-alive connection
+session = requests.Session()
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class Website:
     """
-    A class representing a website to be monitored.
+    A class representing a website to be monitored. Instances are immutable and have no __dict__, which keeps them
+    small and their attributes fast to access when monitoring thousands of websites.
 
     Attributes:
         url (str): The URL of the website.
         interval (int): The monitoring interval in seconds.
         regex_pattern (Optional[str]): A regex pattern to match in the website content (optional).
+        compiled_pattern (Optional[CompiledPattern]): The regex pattern compiled once at initialization,
+            None without a pattern.
 
     Raises:
         AssertionError: If the URL is not valid or the interval is not within the range of 5 to 300.
@@ -38,6 +45,7 @@ class Website:
     url: str
     interval: int
     regex_pattern: Optional[str] = field(default=None)
+    compiled_pattern: Optional[CompiledPattern] = field(default=None, init=False, repr=False, compare=False)
 
     # Normally, __post_init__ doesn't work without __init__ but it works with dataclasses
     # because using the `@dataclass` decorator, Python automatically generates an __init__ method.
@@ -50,7 +58,8 @@ class Website:
                                                                               "and 300")
         if self.regex_pattern is not None:
             try:
-                re.compile(self.regex_pattern)
+                # The dataclass is frozen, so bypass its __setattr__
+                object.__setattr__(self, 'compiled_pattern', compile_pattern(self.regex_pattern))
             except re.error:
                 raise ValueError("regex_pattern must be a valid regex pattern")
 
@@ -83,8 +92,8 @@ def load_websites(file_path: str) -> List[Website]:
     Returns:
         List[Website]: A list of Website objects.
     """
-    with open(file_path, 'r') as file:
-        websites_data = json.load(file)
+    with open(file_path, 'rb') as file:
+        websites_data = orjson.loads(file.read())
     return [Website(**website) for website in websites_data]
 
 
@@ -97,7 +106,7 @@ def is_connected() -> bool:
         bool: True if there is an internet connection, False otherwise.
     """
     try:
-        requests.get('http://google.com', timeout=5)
+        session.get('http://google.com', timeout=5)
         return True
     except requests.exceptions.RequestException:
         return False